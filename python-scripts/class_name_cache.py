@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Shared, on-disk cached scan of the class declarations in an Apex class file.
+
+generate_test_class.py and remove_metadata_core_classes.py both need the
+class names declared in MetadataCore.cls. The result of the scan is stored in
+~/.cache/pylons-apex-mdapi/classnames.pkl keyed by the file's path,
+modification time and size, so running the scripts back to back only scans
+the file once.
+"""
+
+import os
+import pickle
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+# Matches: public class ClassName {
+CLASS_DECL_RE = re.compile(r'^\s*public\s+class\s+([A-Za-z_][A-Za-z0-9_]*)\s*\{', re.MULTILINE)
+
+
+def _cache_file() -> Optional[Path]:
+    """
+    Location of the cache file, or None if no cache directory can be determined.
+
+    XDG_CACHE_HOME is only honoured when it is set to an absolute path, as the
+    XDG spec requires; otherwise ~/.cache is used.
+    """
+    xdg_cache_home = os.environ.get('XDG_CACHE_HOME')
+    if xdg_cache_home and Path(xdg_cache_home).is_absolute():
+        cache_dir = Path(xdg_cache_home)
+    else:
+        try:
+            home = Path.home()
+        except (RuntimeError, KeyError):
+            return None
+        if not home.is_absolute():
+            return None
+        cache_dir = home / '.cache'
+    return cache_dir / 'pylons-apex-mdapi' / 'classnames.pkl'
+
+
+CACHE_FILE = _cache_file()
+
+CacheKey = Tuple[str, int, int]
+ScanResult = Tuple[Optional[str], List[str]]
+
+
+def _load_cache() -> Dict[CacheKey, ScanResult]:
+    """Load the cache file, treating a missing or unreadable file as empty."""
+    if CACHE_FILE is None:
+        return {}
+    try:
+        with open(CACHE_FILE, 'rb') as file:
+            cache = pickle.load(file)
+    except Exception:
+        # Corrupt, truncated or incompatible pickles all just mean a rescan
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def _is_scan_result(value) -> bool:
+    """Check that a cached value has the (str | None, list of str) shape of a scan."""
+    return (
+        isinstance(value, tuple)
+        and len(value) == 2
+        and (value[0] is None or isinstance(value[0], str))
+        and isinstance(value[1], list)
+        and all(isinstance(name, str) for name in value[1])
+    )
+
+
+def _save_cache(cache: Dict[CacheKey, ScanResult]):
+    """Write the cache file; failing to write only costs a rescan next time."""
+    if CACHE_FILE is None:
+        return
+    try:
+        CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = CACHE_FILE.with_suffix('.tmp')
+        with open(tmp_file, 'wb') as file:
+            pickle.dump(cache, file)
+        os.replace(tmp_file, CACHE_FILE)
+    except OSError:
+        pass
+
+
+def cached_class_scan(file_path: str) -> ScanResult:
+    """
+    Get the class names declared in an Apex class file.
+
+    Args:
+        file_path: Path to the Apex class file
+
+    Returns:
+        Tuple of (main_class_name, inner_class_names) where main_class_name is
+        the first class declared in the file (None if there are none) and
+        inner_class_names lists the other classes in the order they appear
+    """
+    path = Path(file_path).resolve()
+    stat = path.stat()
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+
+    cache = _load_cache()
+    cached = cache.get(key)
+    if _is_scan_result(cached):
+        return cached
+
+    content = path.read_text(encoding='utf-8')
+    class_names = [match.group(1) for match in CLASS_DECL_RE.finditer(content)]
+    result = (class_names[0], class_names[1:]) if class_names else (None, [])
+
+    # Drop stale entries for the same file, and anything malformed, before storing the new scan
+    cache = {k: v for k, v in cache.items()
+             if isinstance(k, tuple) and len(k) == 3 and k[0] != key[0] and _is_scan_result(v)}
+    cache[key] = result
+    _save_cache(cache)
+
+    return result
@@ -10,31 +10,88 @@ Usage: python extract_types.py [output_file]
 
 import sys
 import re
+import copy
 import xml.etree.ElementTree as ET
 from pathlib import Path
-from typing import Set, Dict, List, Optional
-import shutil
+from typing import Set, Dict, Iterator, List, Optional, FrozenSet
+
+def iter_schema_types(metadata_file) -> Iterator[ET.Element]:
+    """Stream the named type definitions of the xsd:schema in metadata.xml
+
+    xsd:schema is only looked for at the root or the two levels below it
+    (e.g. definitions/types/schema), and only its direct complexType and
+    simpleType children with a name are yielded. Each is detached from its
+    parent once parsed and everything else is cleared and detached as soon
+    as it ends, so the parsed tree never grows beyond the open path.
+
+    Raises ValueError if no xsd:schema element is found.
+    """
+    open_elements: List[ET.Element] = []
+    schema_depth: Optional[int] = None
+    in_type = False
+    found_schema = False
+
+    for event, elem in ET.iterparse(str(metadata_file), events=('start', 'end')):
+        if event == 'end':
+            open_elements.pop()
+        depth = len(open_elements)
+
+        is_schema = schema_depth is None and depth <= 2 and (
+            elem.tag.endswith('}schema') or elem.tag == 'schema'
+        )
+        is_named_type = (
+            schema_depth is not None
+            and depth == schema_depth + 1
+            and (elem.tag.endswith('}complexType') or elem.tag.endswith('}simpleType'))
+            and elem.get('name') is not None
+        )
+
+        if event == 'start':
+            open_elements.append(elem)
+            if is_schema:
+                schema_depth = depth
+                found_schema = True
+            elif is_named_type:
+                in_type = True
+            continue
+
+        parent = open_elements[-1] if open_elements else None
+
+        if schema_depth == depth:
+            schema_depth = None
+        elif is_named_type:
+            in_type = False
+            if parent is not None:
+                parent.remove(elem)
+            yield elem
+            continue
+
+        # Anything outside a named type is no longer needed
+        if not in_type:
+            elem.clear()
+            if parent is not None:
+                parent.remove(elem)
+
+    if not found_schema:
+        raise ValueError("Could not find xsd:schema element in metadata.xml")
 
 class TypeExtractor:
+    _SCHEMA_END_RE = re.compile(rb'(\s*)</xsd:schema>')
+
     def __init__(self, metadata_file: str, base_file: str):
         self.metadata_file = Path(metadata_file)
         self.base_file = Path(base_file)
         self.namespace = "http://soap.sforce.com/2006/04/metadata"
         self.tns_prefix = "tns:"
         
-        # Parse metadata.xml
-        self.metadata_tree = ET.parse(self.metadata_file)
-        self.metadata_root = self.metadata_tree.getroot()
-        
-        # Find the schema element
-        self.schema = self._find_schema_element()
-        
         # Cache for found types
         self.type_definitions: Dict[str, ET.Element] = {}
-        self.found_dependencies: Set[str] = set()
+        self._direct_refs: Dict[str, FrozenSet[str]] = {}
+        self._closure_cache: Dict[str, FrozenSet[str]] = {}
+        self._xml_cache: Dict[str, bytes] = {}
         
-        # Build type cache
-        self._build_type_cache()
+        # Stream metadata.xml into the type cache
+        self._stream_build_cache()
 
     def get_types_list(self) -> List[str]:
         """Get the hardcoded list of types to process"""
@@ -42,136 +99,151 @@ class TypeExtractor:
             "CustomObject"
         ]
     
-    def _find_schema_element(self) -> ET.Element:
-        """Find the xsd:schema element in metadata.xml"""
-        for elem in self.metadata_root.iter():
-            if elem.tag.endswith('}schema') or elem.tag == 'schema':
-                return elem
-        raise ValueError("Could not find xsd:schema element in metadata.xml")
-    
-    def _build_type_cache(self):
-        """Build a cache of all type definitions in metadata.xml"""
-        for elem in self.schema.iter():
-            if elem.tag.endswith('}complexType') or elem.tag.endswith('}simpleType'):
-                name = elem.get('name')
-                if name:
-                    self.type_definitions[name] = elem
-    
+    def _stream_build_cache(self):
+        """Build a cache of all type definitions and their direct references
+
+        metadata.xml is streamed with iter_schema_types rather than loaded as
+        a whole tree, so only the type definitions are kept in memory.
+        """
+        for elem in iter_schema_types(self.metadata_file):
+            name = elem.get('name')
+            self.type_definitions[name] = elem
+            self._direct_refs[name] = frozenset(self._extract_type_references(elem))
+
     def _extract_type_references(self, element: ET.Element) -> Set[str]:
         """Extract all tns: type references from an element and its children"""
         references = set()
-        
-        # Check all attributes for type references
-        for attr_value in element.attrib.values():
-            if attr_value.startswith(self.tns_prefix):
-                type_name = attr_value[len(self.tns_prefix):]
-                references.add(type_name)
-        
-        # Recursively check child elements
-        for child in element:
-            references.update(self._extract_type_references(child))
-        
-        return references
-    
-    def find_dependencies(self, type_name: str) -> Set[str]:
-        """Find all dependencies for a given type recursively"""
-        if type_name in self.found_dependencies:
-            return set()
-        
-        if type_name not in self.type_definitions:
-            print(f"Warning: Type '{type_name}' not found in metadata.xml")
-            return set()
-        
-        self.found_dependencies.add(type_name)
-        dependencies = set()
-        
-        # Get the type definition
-        type_def = self.type_definitions[type_name]
-        
-        # Extract all type references from this definition
-        references = self._extract_type_references(type_def)
-        
-        # Recursively find dependencies
-        for ref in references:
-            if ref not in self.found_dependencies:
-                dependencies.add(ref)
-                dependencies.update(self.find_dependencies(ref))
-        
-        return dependencies
-    
-    def get_type_definition_xml(self, type_name: str) -> Optional[str]:
-        """Get the XML string for a type definition with proper indentation"""
-        if type_name not in self.type_definitions:
-            return None
+        prefix = self.tns_prefix
+        prefix_len = len(prefix)
 
-        elem = self.type_definitions[type_name]
+        # element.iter() walks the whole subtree in C, no Python recursion
+        for sub in element.iter():
+            for attr_value in sub.attrib.values():
+                if attr_value.startswith(prefix):
+                    references.add(attr_value[prefix_len:])
 
-        # Convert element to string with proper formatting
-        xml_str = ET.tostring(elem, encoding='unicode')
-
-        # Clean up the XML formatting
-        xml_str = xml_str.replace('><', '>\n<')
+        return references
+    
+    def find_dependencies(self, type_name: str) -> FrozenSet[str]:
+        """Find all dependencies for a given type (its transitive closure)
 
-        # Add proper indentation (4 spaces for schema content)
-        lines = xml_str.split('\n')
-        indented_lines = []
-        base_indent = '    '  # Base indentation for schema content
+        Closures are computed once per type and cached, so shared subtrees
+        are only walked a single time. Cycles are resolved with an iterative
+        Tarjan SCC pass: every member of a strongly connected component
+        shares the same closure.
 
-        for line in lines:
-            stripped = line.strip()
-            if not stripped:
-                continue
+        The cached closure is returned as is, so repeated calls (e.g. for
+        several output files) cost a single dict lookup.
+        """
+        if type_name in self._closure_cache:
+            return self._closure_cache[type_name]
 
-            # Calculate additional indentation based on nesting
-            if stripped.startswith('</'):
-                # Closing tag - reduce indent
-                indent_level = max(0, line.count('<') - line.count('</') - 1)
-            elif stripped.startswith('<') and not stripped.endswith('/>') and '>' not in stripped[1:]:
-                # Opening tag
-                indent_level = line.count('<') - line.count('</')
+        if type_name not in self.type_definitions:
+            print(f"Warning: Type '{type_name}' not found in metadata.xml")
+            self._closure_cache[type_name] = frozenset()
+            return self._closure_cache[type_name]
+
+        index: Dict[str, int] = {}
+        lowlink: Dict[str, int] = {}
+        scc_stack: List[str] = []
+        on_stack: Set[str] = set()
+
+        def visit(name: str):
+            index[name] = lowlink[name] = len(index)
+            scc_stack.append(name)
+            on_stack.add(name)
+            if name not in self._direct_refs:
+                print(f"Warning: Type '{name}' not found in metadata.xml")
+            return iter(self._direct_refs.get(name, ()))
+
+        work = [(type_name, visit(type_name))]
+        while work:
+            name, children = work[-1]
+            for ref in children:
+                if ref in self._closure_cache:
+                    continue
+                if ref not in index:
+                    work.append((ref, visit(ref)))
+                    break
+                if ref in on_stack:
+                    lowlink[name] = min(lowlink[name], index[ref])
             else:
-                # Content or self-closing tag
-                indent_level = max(0, line.count('<') - line.count('</'))
-
-            # Apply indentation
-            full_indent = base_indent + ('     ' * indent_level)
-            indented_lines.append(full_indent + stripped)
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[name])
+                if lowlink[name] != index[name]:
+                    continue
+
+                # name is the root of a strongly connected component
+                component = set()
+                while True:
+                    member = scc_stack.pop()
+                    on_stack.discard(member)
+                    component.add(member)
+                    if member == name:
+                        break
+
+                closure = set()
+                for member in component:
+                    for ref in self._direct_refs.get(member, ()):
+                        closure.add(ref)
+                        if ref not in component:
+                            closure.update(self._closure_cache[ref])
+                closure = frozenset(closure)
+                for member in component:
+                    self._closure_cache[member] = closure
+
+        return self._closure_cache[type_name]
 
-        return '\n'.join(indented_lines)
-
-    def create_output_file_from_types(self, output_file: Optional[str] = None) -> str:
-        """Create output XML file with types from hardcoded list"""
-        types_list = self.get_types_list()
+    def get_type_definition_xml(self, type_name: str) -> Optional[str]:
+        """Get the XML string for a type definition with proper indentation"""
+        type_xml = self._get_type_definition_bytes(type_name)
+        if type_xml is None:
+            return None
+        return type_xml.decode('utf-8')
+
+    def create_output_file_from_types(self, output_file: Optional[str] = None,
+                                      seed_types: Optional[List[str]] = None) -> str:
+        """Create output XML file with the given types (default: hardcoded list)
+
+        Can be called repeatedly on the same extractor to write several output
+        files; metadata.xml is parsed once and dependency closures are reused.
+        """
+        if seed_types is None:
+            types_list = self.get_types_list()
+            source = " from hardcoded list"
+        else:
+            types_list = seed_types
+            source = ""
 
         if output_file is None:
             output_file = "output.xml"
 
         output_path = Path(output_file)
-
-        # Copy base.xml to output file
-        shutil.copy2(self.base_file, output_path)
+        base_bytes = self.base_file.read_bytes()
 
         # Find all dependencies for all types
-        print(f"Processing {len(types_list)} types from hardcoded list:")
+        print(f"Processing {len(types_list)} types{source}:")
         for type_name in types_list:
             print(f"  - {type_name}")
 
-        self.found_dependencies.clear()  # Reset for fresh search
-        all_dependencies = set()
+        closures = []
 
         for type_name in types_list:
             print(f"\nFinding dependencies for: {type_name}")
-            dependencies = self.find_dependencies(type_name)
-            dependencies.add(type_name)  # Include the main type
-            all_dependencies.update(dependencies)
+            dependencies = self.find_dependencies(type_name) | {type_name}  # Include the main type
+            closures.append(dependencies)
             print(f"  Found {len(dependencies)} dependencies for {type_name}")
 
+        all_dependencies = set().union(*closures)
+
         print(f"\nTotal unique types to add: {len(all_dependencies)}")
         for dep in sorted(all_dependencies):
             print(f"  - {dep}")
 
-        # Parse the output file and add types
-        self._add_types_to_file(output_path, all_dependencies)
+        # Write base.xml with the types added
+        self._add_types_to_file(output_path, all_dependencies, base_bytes)
 
         print(f"\nCreated output file: {output_path}")
         print(f"Added {len(all_dependencies)} type definitions")
@@ -180,51 +252,49 @@ class TypeExtractor:
 
 
 
-    def _add_types_to_file(self, output_path: Path, dependencies: Set[str]):
-        """Add type definitions to the XML file"""
-        # Parse the output file
-        tree = ET.parse(output_path)
-        root = tree.getroot()
+    def _get_type_definition_bytes(self, type_name: str) -> Optional[bytes]:
+        """Get the UTF-8 encoded XML for a type definition, serializing it only once"""
+        if type_name in self._xml_cache:
+            return self._xml_cache[type_name]
 
-        # Find the schema element and the closing </xsd:schema> tag location
-        schema_elem = None
-        for elem in root.iter():
-            if elem.tag.endswith('}schema') or elem.tag == 'schema':
-                schema_elem = elem
-                break
+        if type_name not in self.type_definitions:
+            return None
 
-        if schema_elem is None:
-            raise ValueError("Could not find xsd:schema element in base.xml")
+        # ET.indent works in place, so format a copy and leave the cache intact
+        elem = copy.deepcopy(self.type_definitions[type_name])
+        elem.tail = None
 
-        # Read the file content to insert types before </xsd:schema>
-        with open(output_path, 'r', encoding='utf-8') as f:
-            content = f.read()
+        # Named types in base.xml start at 4 spaces and nest 1 space per level
+        ET.indent(elem, space=' ', level=4)
+        self._xml_cache[type_name] = b'    ' + ET.tostring(elem, encoding='unicode').encode('utf-8')
+        return self._xml_cache[type_name]
 
-        # Find the position to insert new types (before </xsd:schema>)
-        schema_end_pattern = r'(\s*)</xsd:schema>'
-        match = re.search(schema_end_pattern, content)
+    def _add_types_to_file(self, output_path: Path, dependencies: Set[str], base_bytes: bytes):
+        """Insert type definitions before </xsd:schema> and write the output file"""
+        match = self._SCHEMA_END_RE.search(base_bytes)
 
         if not match:
-            raise ValueError("Could not find </xsd:schema> closing tag")
+            raise ValueError("Could not find </xsd:schema> closing tag in base.xml")
 
-        # Build the types XML to insert
-        types_xml = []
+        # Each definition starts on its own line; the whitespace captured before
+        # </xsd:schema> keeps the closing tag on a line of its own
+        insert_pos = match.start(1)
+        chunks = [base_bytes[:insert_pos]]
         for type_name in sorted(dependencies):
-            type_xml = self.get_type_definition_xml(type_name)
+            type_xml = self._get_type_definition_bytes(type_name)
             if type_xml:
-                types_xml.append(type_xml)
+                chunks.append(b'\n' + type_xml)
+        chunks.append(base_bytes[insert_pos:])
 
-        # Insert the types before </xsd:schema>
-        insert_pos = match.start(1)
-        new_content = (
-            content[:insert_pos] +
-            '\n'.join(types_xml) + '\n' +
-            content[insert_pos:]
-        )
+        output_path.write_bytes(b''.join(chunks))
+
+def list_type_names(metadata_file: str) -> Set[str]:
+    """List the names of all types in metadata.xml without building a TypeExtractor
 
-        # Write the updated content
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(new_content)
+    Uses the same schema and depth rules as TypeExtractor, so every listed
+    name can be extracted, but keeps no definitions and scans no references.
+    """
+    return {elem.get('name') for elem in iter_schema_types(metadata_file)}
 
 def main():
     # Handle special commands
@@ -251,11 +321,26 @@ def main():
     metadata_file = "./metadata.xml"
     base_file = "./base.xml"
 
-    # Check if files exist
+    # Check if metadata.xml exists
     if not Path(metadata_file).exists():
         print(f"Error: metadata.xml not found at {metadata_file}")
         sys.exit(1)
 
+    # Handle --list-types command (only needs the type names from metadata.xml)
+    if len(sys.argv) > 1 and sys.argv[1] == "--list-types":
+        try:
+            type_names = list_type_names(metadata_file)
+        except Exception as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+        print("Available types in metadata.xml:")
+        print("=" * 40)
+        for type_name in sorted(type_names):
+            print(f"  {type_name}")
+        print(f"\nTotal: {len(type_names)} types")
+        sys.exit(0)
+
     if not Path(base_file).exists():
         print(f"Error: base.xml not found at {base_file}")
         sys.exit(1)
@@ -263,17 +348,8 @@ def main():
     try:
         extractor = TypeExtractor(metadata_file, base_file)
 
-        # Handle --list-types command
-        if len(sys.argv) > 1 and sys.argv[1] == "--list-types":
-            print("Available types in metadata.xml:")
-            print("=" * 40)
-            for type_name in sorted(extractor.type_definitions.keys()):
-                print(f"  {type_name}")
-            print(f"\nTotal: {len(extractor.type_definitions)} types")
-            sys.exit(0)
-
         # Default behavior: process types from hardcoded list
-        output_file = sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] != "--list-types" else None
+        output_file = sys.argv[1] if len(sys.argv) > 1 else None
 
         output_path = extractor.create_output_file_from_types(output_file)
         print(f"\nSuccess! Output written to: {output_path}")
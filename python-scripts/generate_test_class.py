@@ -5,11 +5,12 @@ Parses the main class file, extracts all inner class names, and creates
 a test class with instantiation coverage for all classes.
 """
 
-import re
 import os
 import sys
 from typing import Set, List
 
+from class_name_cache import cached_class_scan
+
 
 def extract_all_class_names(file_path: str) -> tuple[str, Set[str]]:
     """
@@ -22,26 +23,17 @@ def extract_all_class_names(file_path: str) -> tuple[str, Set[str]]:
         Tuple of (main_class_name, set_of_inner_class_names)
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-            
-        # Pattern to match class declarations
-        pattern = r'^\s*public\s+class\s+([A-Za-z_][A-Za-z0-9_]*)\s*\{'
+        # First class is the main class, remaining classes are inner classes
+        main_class_name, inner_class_names = cached_class_scan(file_path)
         
-        matches = list(re.finditer(pattern, content, re.MULTILINE))
-        
-        if not matches:
+        if main_class_name is None:
             print(f"Error: No classes found in {file_path}")
             sys.exit(1)
         
-        # First class is the main class
-        main_class_name = matches[0].group(1)
         print(f"Found main class: {main_class_name}")
         
-        # Remaining classes are inner classes
         inner_classes = set()
-        for match in matches[1:]:
-            class_name = match.group(1)
+        for class_name in inner_class_names:
             inner_classes.add(class_name)
             print(f"Found inner class: {class_name}")
             
@@ -77,24 +69,24 @@ def generate_test_class_content(main_class_name: str, inner_classes: Set[str], t
     class_chunks = [sorted_classes[i:i + classes_per_method]
                    for i in range(0, len(sorted_classes), classes_per_method)]
 
-    content = f"""//Generated test class for {main_class_name}
+    parts: List[str] = [f"""//Generated test class for {main_class_name}
 
 @IsTest
 public class {test_class_name} {{
-"""
+"""]
 
     # Add test setup method if requested
     if include_setup:
-        content += """
+        parts.append("""
     @TestSetup
     static void setupTestData() {
         // Add any test data setup here if needed
         // Use TestDataFactory methods for creating test records
     }
-"""
+""")
 
     # Main class test
-    content += f"""
+    parts.append(f"""
     @IsTest
     private static void testMainClass() {{
         Test.startTest();
@@ -105,33 +97,34 @@ public class {test_class_name} {{
 
         Test.stopTest();
     }}
-"""
+""")
 
     # Generate test methods for inner classes
     for i, chunk in enumerate(class_chunks, 1):
         method_name = f"coverGeneratedCodeTypes{i}" if i > 1 else "coverGeneratedCodeTypes"
 
-        content += f"""
+        parts.append(f"""
     @IsTest
     private static void {method_name}() {{
         Test.startTest();
 
         // Test inner class instantiations
-"""
+""")
 
         # Add instantiation for each class in the chunk
         for class_name in chunk:
-            content += f"        {main_class_name}.{class_name} {class_name.lower()}Instance = new {main_class_name}.{class_name}();\n"
-            content += f"        System.assertNotEquals(null, {class_name.lower()}Instance, '{class_name} should be instantiated');\n"
+            lc = class_name.lower()
+            parts.append(f"        {main_class_name}.{class_name} {lc}Instance = new {main_class_name}.{class_name}();\n"
+                         f"        System.assertNotEquals(null, {lc}Instance, '{class_name} should be instantiated');\n")
 
-        content += """
+        parts.append("""
         Test.stopTest();
     }
-"""
+""")
 
-    content += "}\n"
+    parts.append("}\n")
 
-    return content
+    return ''.join(parts)
 
 
 def main():
@@ -7,8 +7,49 @@ This creates a dedicated purpose-driven class for Custom Objects and their depen
 import re
 import os
 import sys
+from functools import lru_cache
 from typing import Set, List, Tuple
 
+from class_name_cache import cached_class_scan
+
+# A "public class Name" declaration, optionally extending or implementing another
+# type. Only plain declarations (no extends/implements group) are removable, as
+# with the class_name_cache pattern; the others are only counted for the summary.
+_PUBLIC_CLASS_DECL_RE = re.compile(
+    r'^\s*public\s+class\s+([A-Za-z_][A-Za-z0-9_]*)'
+    r'(\s+(?:extends|implements)\s[^{\n]*?)?\s*\{',
+    re.MULTILINE
+)
+
+# Braces plus the string literals and comments whose braces must be ignored
+_BRACE_SCAN_RE = re.compile(r"'(?:\\.|[^'\\])*'|//[^\n]*|/\*.*?\*/|[{}]", re.DOTALL)
+
+# Formatting problems fixed by clean_formatting() in a single pass:
+#   joined - a class declaration that follows a closing brace on the same line
+#   blank  - runs of more than one blank line left behind by removed classes
+_CLEANUP_RE = re.compile(
+    r'(?P<joined>\}[ \t]*)(?=public\s+class\b)'
+    r'|(?P<blank>\n(?:[ \t]*\n){2,})'
+)
+
+
+def _cleanup_replacement(match: re.Match[str]) -> str:
+    """Replacement for a single _CLEANUP_RE match."""
+    if match.lastgroup == 'joined':
+        return '}\n\n    '
+    return '\n\n'
+
+
+@lru_cache(maxsize=None)
+def _class_reference_patterns(class_name: str) -> Tuple[re.Pattern[str], re.Pattern[str], re.Pattern[str]]:
+    """Compiled patterns for the main declaration, qualified and bare references of a class."""
+    escaped = re.escape(class_name)
+    return (
+        re.compile(rf'^public class {escaped}\s*\{{', re.MULTILINE),
+        re.compile(rf'\b{escaped}\.([A-Za-z_][A-Za-z0-9_]*)'),
+        re.compile(rf'\b{escaped}\b'),
+    )
+
 
 def extract_class_names_from_file(file_path: str) -> Set[str]:
     """
@@ -23,21 +64,13 @@ def extract_class_names_from_file(file_path: str) -> Set[str]:
     class_names = set()
 
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-
-        # Pattern to match inner class declarations
-        # Matches: public class ClassName {
-        pattern = r'^\s*public\s+class\s+([A-Za-z_][A-Za-z0-9_]*)\s*\{'
+        main_class_name, inner_classes = cached_class_scan(file_path)
 
-        matches = list(re.finditer(pattern, content, re.MULTILINE))
+        # Skip the main outer class (first class in file)
+        if main_class_name is not None:
+            print(f"Skipping main class: {main_class_name}")
 
-        for i, match in enumerate(matches):
-            class_name = match.group(1)
-            # Skip the main outer class (first class in file)
-            if i == 0:  # This is the first class found (main class)
-                print(f"Skipping main class: {class_name}")
-                continue
+        for class_name in inner_classes:
             class_names.add(class_name)
             print(f"Found inner class: {class_name}")
 
@@ -51,59 +84,59 @@ def extract_class_names_from_file(file_path: str) -> Set[str]:
     return class_names
 
 
-def find_class_boundaries(content: str, class_name: str) -> Tuple[int, int]:
+def _line_end(content: str, pos: int) -> int:
+    """Return the position just past the line break that ends the line containing pos."""
+    end_pos = content.find('\n', pos)
+    if end_pos == -1:
+        return len(content)
+    return end_pos + 1
+
+
+def _scan_all_classes(content: str) -> Tuple[List[Tuple[int, int, str]], int]:
     """
-    Find the start and end positions of a class definition in the content.
+    Locate every class definition in the content with a single pass.
+
+    Braces are matched with a stack while string literals and comments are
+    skipped, so nested classes are found in the same sweep as their parents.
 
     Args:
         content: The file content as string
-        class_name: Name of the class to find
 
     Returns:
-        Tuple of (start_pos, end_pos) or (-1, -1) if not found
+        Tuple of (classes, declaration_count). classes lists
+        (start_pos, end_pos, class_name) for every plain
+        "public class Name {" definition in order of the closing brace;
+        start_pos includes any blank lines and indentation before the
+        declaration and end_pos includes the rest of the line after the
+        closing brace and its line break. declaration_count also counts
+        "public class" declarations that extend or implement another type.
     """
-    # Pattern to match the class declaration with proper indentation
-    pattern = rf'(\s*)public\s+class\s+{re.escape(class_name)}\s*\{{'
-
-    match = re.search(pattern, content, re.MULTILINE)
-    if not match:
-        return (-1, -1)
-
-    # Start from the beginning of the line (including indentation)
-    start_pos = match.start()
-
-    # Find the matching closing brace
-    brace_count = 0
-    pos = match.end() - 1  # Start from the opening brace
-
-    while pos < len(content):
-        char = content[pos]
+    # Map the opening brace of each plain declaration to its start and class name
+    declarations = {}
+    declaration_count = 0
+    for match in _PUBLIC_CLASS_DECL_RE.finditer(content):
+        declaration_count += 1
+        if match.group(2) is None:
+            declarations[match.end() - 1] = (match.start(), match.group(1))
+
+    classes = []
+    open_braces = []
+
+    # Jump straight from one brace, string literal or comment to the next
+    for token in _BRACE_SCAN_RE.finditer(content):
+        char = token.group()
         if char == '{':
-            brace_count += 1
-        elif char == '}':
-            brace_count -= 1
-            if brace_count == 0:
-                # Found the matching closing brace
-                # Include the closing brace and move to next line
-                end_pos = pos + 1
+            open_braces.append(declarations.get(token.start()))
+        elif char == '}' and open_braces:
+            opened = open_braces.pop()
+            if opened is not None:
+                start_pos, class_name = opened
+                classes.append((start_pos, _line_end(content, token.end()), class_name))
 
-                # Skip to the end of the current line
-                while end_pos < len(content) and content[end_pos] not in '\r\n':
-                    end_pos += 1
+    return classes, declaration_count
 
-                # Include the newline character(s)
-                if end_pos < len(content) and content[end_pos] == '\r':
-                    end_pos += 1
-                if end_pos < len(content) and content[end_pos] == '\n':
-                    end_pos += 1
 
-                return (start_pos, end_pos)
-        pos += 1
-
-    return (-1, -1)
-
-
-def remove_classes_from_content(content: str, classes_to_remove: Set[str]) -> Tuple[str, List[str]]:
+def remove_classes_from_content(content: str, classes_to_remove: Set[str]) -> Tuple[str, List[str], int]:
     """
     Remove specified classes from the content.
     
@@ -112,36 +145,46 @@ def remove_classes_from_content(content: str, classes_to_remove: Set[str]) -> Tu
         classes_to_remove: Set of class names to remove
         
     Returns:
-        Modified content with classes removed
+        Tuple of (modified content with classes removed, removed class names,
+        total number of "public class" declarations in the original content,
+        including the outer class)
     """
-    # Sort classes by their position in the file (reverse order to avoid position shifts)
-    class_positions = []
-    
-    for class_name in classes_to_remove:
-        start_pos, end_pos = find_class_boundaries(content, class_name)
-        if start_pos != -1:
-            class_positions.append((start_pos, end_pos, class_name))
-            print(f"Found class to remove: {class_name} at positions {start_pos}-{end_pos}")
-        else:
-            print(f"Class not found in target file: {class_name}")
-    
-    # Sort by start position in reverse order
-    class_positions.sort(key=lambda x: x[0], reverse=True)
-    
-    # Remove classes from content
-    modified_content = content
+    all_classes, declaration_count = _scan_all_classes(content)
+    class_positions = [position for position in all_classes
+                       if position[2] in classes_to_remove]
+
+    for start_pos, end_pos, class_name in class_positions:
+        print(f"Found class to remove: {class_name} at positions {start_pos}-{end_pos}")
+    for class_name in sorted(classes_to_remove - {position[2] for position in class_positions}):
+        print(f"Class not found in target file: {class_name}")
+
+    # Copy the surviving ranges once instead of re-slicing the whole content per class
+    class_positions.sort(key=lambda x: x[0])
+
+    parts = []
     removed_classes = []
-    
+    prev = 0
+
     for start_pos, end_pos, class_name in class_positions:
-        modified_content = modified_content[:start_pos] + modified_content[end_pos:]
         removed_classes.append(class_name)
-    
-    return modified_content, removed_classes
+        if start_pos < prev:
+            # Nested inside a class that is already being removed
+            continue
+        parts.append(content[prev:start_pos])
+        prev = end_pos
+
+    parts.append(content[prev:])
+
+    return ''.join(parts), removed_classes, declaration_count
 
 
 def clean_formatting(content: str) -> str:
     """
-    Clean up any formatting issues in the content.
+    Clean up formatting left behind by class removal.
+
+    Class declarations joined onto the line of a closing brace are moved to
+    their own line and runs of blank lines are collapsed to one, all in a
+    single pass over the content.
 
     Args:
         content: The content to clean
@@ -149,29 +192,7 @@ def clean_formatting(content: str) -> str:
     Returns:
         Cleaned content
     """
-    # Remove any orphaned "lass" fragments that might be left from incomplete removals
-    content = re.sub(r'^\s*lass\s*\{.*?\}', '', content, flags=re.MULTILINE | re.DOTALL)
-
-    # Fix missing newlines between class closing brace and next class
-    content = re.sub(r'(\}\s*)(\s*public\s+class)', r'\1\n    \2', content)
-
-    # Ensure proper spacing before class declarations
-    content = re.sub(r'(\}\s*)(public\s+class)', r'\1\n    \2', content)
-
-    # Remove multiple consecutive empty lines (more than 2)
-    content = re.sub(r'\n\s*\n\s*\n\s*\n+', '\n\n', content)
-
-    # Fix malformed class declarations - handle various truncation patterns
-    content = re.sub(r'(\}\s*)c\s+class\s+([A-Za-z_][A-Za-z0-9_]*)', r'\1\n    public class \2', content)
-    content = re.sub(r'(\}\s*)ublic\s+class\s+([A-Za-z_][A-Za-z0-9_]*)', r'\1\n    public class \2', content)
-    content = re.sub(r'^\s*public\s+c\s+([A-Za-z_][A-Za-z0-9_]*)', r'    public class \1', content, flags=re.MULTILINE)
-    content = re.sub(r'^\s*c\s+class\s+([A-Za-z_][A-Za-z0-9_]*)', r'    public class \1', content, flags=re.MULTILINE)
-    content = re.sub(r'^\s*ublic\s+class\s+([A-Za-z_][A-Za-z0-9_]*)', r'    public class \1', content, flags=re.MULTILINE)
-
-    # Ensure consistent indentation for class declarations
-    content = re.sub(r'^(\s*)public\s+class\s+([A-Za-z_][A-Za-z0-9_]*)', r'    public class \2', content, flags=re.MULTILINE)
-
-    return content
+    return _CLEANUP_RE.sub(_cleanup_replacement, content)
 
 
 def replace_class_references(content: str, original_class_name: str, new_class_name: str) -> str:
@@ -186,27 +207,16 @@ def replace_class_references(content: str, original_class_name: str, new_class_n
     Returns:
         Content with class name references updated
     """
+    declaration_re, qualified_re, standalone_re = _class_reference_patterns(original_class_name)
+
     # Replace the main class declaration
-    content = re.sub(
-        rf'^public class {re.escape(original_class_name)}\s*\{{',
-        f'public class {new_class_name} {{',
-        content,
-        flags=re.MULTILINE
-    )
+    content = declaration_re.sub(f'public class {new_class_name} {{', content)
 
     # Replace references in type declarations (e.g., soapSforceCom200604Metadata.ClassName)
-    content = re.sub(
-        rf'\b{re.escape(original_class_name)}\.([A-Za-z_][A-Za-z0-9_]*)',
-        rf'{new_class_name}.\1',
-        content
-    )
+    content = qualified_re.sub(rf'{new_class_name}.\1', content)
 
     # Replace standalone references to the class name
-    content = re.sub(
-        rf'\b{re.escape(original_class_name)}\b',
-        new_class_name,
-        content
-    )
+    content = standalone_re.sub(new_class_name, content)
 
     return content
 
@@ -257,7 +267,9 @@ def main():
         sys.exit(1)
     
     print("Removing classes that exist in MetadataCore.cls...")
-    modified_content, removed_classes = remove_classes_from_content(soap_content, metadata_core_classes)
+    modified_content, removed_classes, total_class_count = remove_classes_from_content(
+        soap_content, metadata_core_classes
+    )
 
     print("Cleaning up formatting...")
     modified_content = clean_formatting(modified_content)
@@ -280,9 +292,10 @@ def main():
         sys.exit(1)
     
     print("\nSummary:")
-    print(f"- Original classes in soapSforceCom200604Metadata.cls: {len(re.findall(r'public class [A-Za-z_][A-Za-z0-9_]*', soap_content)) - 1}")
+    # Counts come from the class scan done during removal; the outer class is not counted
+    print(f"- Original classes in soapSforceCom200604Metadata.cls: {total_class_count - 1}")
     print(f"- Classes removed: {len(removed_classes)}")
-    print(f"- Remaining classes in output file: {len(re.findall(r'public class [A-Za-z_][A-Za-z0-9_]*', modified_content)) - 1}")
+    print(f"- Remaining classes in output file: {total_class_count - len(removed_classes) - 1}")
     print(f"- Output class name: {args.output_class_name}")
     print(f"- Output file: {output_path}")
 